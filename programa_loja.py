@@ -1,15 +1,36 @@
 import flet as ft
 import json
 import os
+import gzip
+import hashlib
+from collections import Counter, OrderedDict
 from datetime import datetime
 import uuid
 import math
+import re
+import bisect
+import unicodedata
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, unquote, parse_qs
 from dateutil.relativedelta import relativedelta 
 
 # Arquivos e pastas
 CLIENTES_FILE = 'clientes.json'
 VENDAS_FILE = 'vendas.json'
 CUPONS_DIR = 'cupons_txt'
+EXTRATOS_DIR = 'extratos_txt'
+SYNC_ESTADO_FILE = 'sync_estado.json'
+SYNC_CONFLITOS_FILE = 'sync_conflitos.json'
+
+# API local de consultas
+API_HOST = '127.0.0.1'
+API_PORTA = 8765
+API_MAX_RESPOSTAS = 1024
+API_MAX_LIMITE_BUSCA = 1000
 
 os.makedirs(CUPONS_DIR, exist_ok=True)
 
@@ -30,6 +51,14 @@ def save_json(data, filename):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
 
+def assinatura_arquivo(filename):
+    # Muda sempre que o arquivo é regravado (por este ou outro processo)
+    try:
+        st = os.stat(filename)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
 
 # Lógica de formatação
 
@@ -95,6 +124,696 @@ def calcular_saldo(venda):
     return round(valor_total - valor_pago, 2)
 
 
+# Consultas por CPF (mesma lógica de buscar_debitos_simples)
+
+def somente_digitos(texto):
+    return "".join(ch for ch in (texto or "") if ch.isdigit())
+
+def vendas_do_cliente(vendas, cpf):
+    cpf = somente_digitos(cpf)
+    return [v for v in vendas if v.get('cliente') and somente_digitos(v['cliente'].get('cpf')) == cpf]
+
+def consultar_saldo(clientes, vendas, cpf):
+    cliente = next((c for c in clientes if somente_digitos(c.get('cpf')) == somente_digitos(cpf)), None)
+    if not cliente:
+        return None
+    saldo_total = round(sum(calcular_saldo(v) for v in vendas_do_cliente(vendas, cpf)), 2)
+    return {
+        'nome': cliente.get('nome', ''),
+        'cpf': cliente.get('cpf', ''),
+        'saldo_devedor': saldo_total
+    }
+
+def consultar_dividas_abertas(clientes, vendas, cpf):
+    if consultar_saldo(clientes, vendas, cpf) is None:
+        return None
+    dividas = []
+    for v in vendas_do_cliente(vendas, cpf):
+        saldo = calcular_saldo(v)
+        if saldo > 0:
+            dividas.append({
+                'id': v.get('id'),
+                'data_compra': v.get('data_compra'),
+                'valor_total': v.get('valor_total', 0),
+                'saldo': saldo,
+                'observacao': v.get('observacao', '')
+            })
+    return dividas
+
+def consultar_pagamentos(clientes, vendas, cpf):
+    if consultar_saldo(clientes, vendas, cpf) is None:
+        return None
+    historico = []
+    for v in vendas_do_cliente(vendas, cpf):
+        for p in v.get('pagamentos', []):
+            historico.append({
+                'venda_id': v.get('id'),
+                'valor': p.get('valor', 0),
+                'data_pagamento': p.get('data_pagamento'),
+                'meio': p.get('meio', ''),
+                'observacao': p.get('observacao', '')
+            })
+    return historico
+
+
+# Índice invertido das observações de vendas e pagamentos
+# Mantido de forma incremental: só vendas novas ou com observações alteradas
+# são tokenizadas de novo a cada atualização.
+
+def normalizar_texto(texto):
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return "".join(ch for ch in decomposto if not unicodedata.combining(ch)).lower()
+
+def tokenizar(texto):
+    return re.findall(r'\w+', normalizar_texto(texto))
+
+class IndiceObservacoes:
+    def __init__(self):
+        self.postagens = {}     # termo -> {(chave, posicao)}; posicao -1 = venda, >= 0 = pagamento
+        self.documentos = {}    # chave -> (assinatura, termos indexados)
+        self.vendas = {}        # chave -> venda
+        self.ordem = {}         # chave -> posição em vendas.json
+        self.vocabulario = None # termos ordenados para busca por prefixo, refeito sob demanda
+        self.assinatura = None  # assinatura de vendas.json na última leitura/gravação
+
+    @staticmethod
+    def chave(venda, posicao):
+        # Vendas antigas podem não ter id; nesse caso a posição no arquivo identifica a venda
+        if venda.get('id'):
+            return venda['id']
+        return f"#{posicao}" if posicao is not None else None
+
+    def _remover_termos(self, chave):
+        _, termos = self.documentos.pop(chave)
+        for termo, doc in termos:
+            docs = self.postagens.get(termo)
+            if docs is not None:
+                docs.discard(doc)
+                if not docs:
+                    del self.postagens[termo]
+                    self.vocabulario = None
+
+    def _remover(self, chave):
+        self._remover_termos(chave)
+        self.vendas.pop(chave, None)
+        self.ordem.pop(chave, None)
+
+    def indexar_venda(self, venda, posicao=None):
+        chave = self.chave(venda, posicao)
+        if chave is None:
+            return
+        # A venda ganhou id depois de indexada pela posição
+        if venda.get('id') and posicao is not None and f"#{posicao}" in self.documentos:
+            self._remover(f"#{posicao}")
+        self.vendas[chave] = venda
+        if posicao is not None:
+            self.ordem[chave] = posicao
+        pagamentos = venda.get('pagamentos', [])
+        assinatura = (venda.get('observacao'), tuple(p.get('observacao') for p in pagamentos))
+        atual = self.documentos.get(chave)
+        if atual is not None:
+            if atual[0] == assinatura:
+                return
+            self._remover_termos(chave)
+
+        termos = set()
+        for termo in tokenizar(venda.get('observacao')):
+            termos.add((termo, (chave, -1)))
+        for i, p in enumerate(pagamentos):
+            for termo in tokenizar(p.get('observacao')):
+                termos.add((termo, (chave, i)))
+
+        for termo, doc in termos:
+            if termo not in self.postagens:
+                self.postagens[termo] = set()
+                self.vocabulario = None
+            self.postagens[termo].add(doc)
+        self.documentos[chave] = (assinatura, termos)
+
+    def atualizar(self, vendas):
+        presentes = set()
+        for i, venda in enumerate(vendas):
+            presentes.add(self.chave(venda, i))
+            self.indexar_venda(venda, i)
+        for chave in [c for c in self.documentos if c not in presentes]:
+            self._remover(chave)
+
+    def atualizar_do_arquivo(self, vendas_file=VENDAS_FILE):
+        # Só relê o arquivo se ele foi alterado fora de gravar_vendas
+        assinatura = assinatura_arquivo(vendas_file)
+        if assinatura != self.assinatura:
+            self.atualizar(load_json(vendas_file))
+            self.assinatura = assinatura
+
+    def gravar_vendas(self, vendas, alteradas, vendas_file=VENDAS_FILE):
+        # Grava vendas.json e reindexa só as vendas alteradas, sem reler o arquivo.
+        # Se o arquivo mudou por fora desde a última leitura, a próxima
+        # atualizar_do_arquivo relê tudo.
+        em_dia = self.assinatura is not None and self.assinatura == assinatura_arquivo(vendas_file)
+        save_json(vendas, vendas_file)
+        if em_dia:
+            for posicao, venda in alteradas:
+                self.indexar_venda(venda, posicao)
+            self.assinatura = assinatura_arquivo(vendas_file)
+
+    def _termos_com_prefixo(self, prefixo):
+        if self.vocabulario is None:
+            self.vocabulario = sorted(self.postagens)
+        inicio = bisect.bisect_left(self.vocabulario, prefixo)
+        termos = []
+        for termo in self.vocabulario[inicio:]:
+            if not termo.startswith(prefixo):
+                break
+            termos.append(termo)
+        return termos
+
+    def buscar(self, consulta, limite=100, inicio=0):
+        termos = tokenizar(consulta)
+        if not termos:
+            return {'total': 0, 'inicio': inicio, 'resultados': []}
+
+        # Todos os termos precisam aparecer; o último aceita prefixo ("gelad" -> "geladeira")
+        conjuntos = [self.postagens.get(t, set()) for t in termos[:-1]]
+        ultimo = set()
+        for termo in self._termos_com_prefixo(termos[-1]):
+            ultimo |= self.postagens[termo]
+        conjuntos.append(ultimo)
+        conjuntos.sort(key=len)
+        encontrados = set(conjuntos[0])
+        for docs in conjuntos[1:]:
+            encontrados &= docs
+
+        ordenados = sorted(encontrados, key=lambda d: (self.ordem.get(d[0], 0), d[1]))
+        resultados = []
+        for chave, posicao in ordenados[inicio:inicio + limite]:
+            venda = self.vendas[chave]
+            cliente = venda.get('cliente', {})
+            resultado = {
+                'venda_id': venda.get('id'),
+                'cliente': cliente.get('nome', ''),
+                'cpf': cliente.get('cpf', ''),
+                'data_compra': venda.get('data_compra'),
+                'valor_total': venda.get('valor_total', 0),
+                'saldo': calcular_saldo(venda),
+            }
+            if posicao < 0:
+                resultado.update({'tipo': 'venda', 'observacao': venda.get('observacao', '')})
+            else:
+                p = venda['pagamentos'][posicao]
+                resultado.update({
+                    'tipo': 'pagamento',
+                    'observacao': p.get('observacao', ''),
+                    'valor_pago': p.get('valor', 0),
+                    'data_pagamento': p.get('data_pagamento'),
+                    'meio': p.get('meio', '')
+                })
+            resultados.append(resultado)
+        return {'total': len(ordenados), 'inicio': inicio, 'resultados': resultados}
+
+
+# Cache das consultas da API
+# Os dados ficam em memória e as respostas prontas são guardadas por rota,
+# limitadas às API_MAX_RESPOSTAS usadas mais recentemente.
+# Qualquer gravação em clientes.json/vendas.json (pela interface ou outro
+# processo) muda a assinatura dos arquivos e descarta o cache.
+
+class CacheConsultas:
+    def __init__(self, clientes_file=CLIENTES_FILE, vendas_file=VENDAS_FILE):
+        self.clientes_file = clientes_file
+        self.vendas_file = vendas_file
+        self.lock = threading.Lock()
+        self.assinatura = None
+        self.clientes = []
+        self.vendas = []
+        self.respostas = OrderedDict()
+        self.indice = IndiceObservacoes()
+        self.indice_assinatura = None
+
+    def _assinatura_arquivos(self):
+        return (assinatura_arquivo(self.clientes_file), assinatura_arquivo(self.vendas_file))
+
+    def _recarregar_se_mudou(self):
+        assinatura = self._assinatura_arquivos()
+        if assinatura != self.assinatura:
+            self.clientes = load_json(self.clientes_file)
+            self.vendas = load_json(self.vendas_file)
+            self.respostas = OrderedDict()
+            self.assinatura = assinatura
+
+    def consultar(self, chave, funcao, *args):
+        with self.lock:
+            self._recarregar_se_mudou()
+            if chave in self.respostas:
+                self.respostas.move_to_end(chave)
+                return self.respostas[chave]
+            assinatura, clientes, vendas = self.assinatura, self.clientes, self.vendas
+
+        # O cálculo roda fora do lock; as listas carregadas não são alteradas.
+        resposta = funcao(clientes, vendas, *args)
+
+        with self.lock:
+            if self.assinatura == assinatura:
+                self.respostas[chave] = resposta
+                if len(self.respostas) > API_MAX_RESPOSTAS:
+                    self.respostas.popitem(last=False)
+        return resposta
+
+    def buscar_observacoes(self, consulta, limite=100, inicio=0):
+        # O índice é alterado nas recargas, então a busca fica dentro do lock.
+        # A resposta não entra no cache: o índice já responde em milissegundos
+        # e cada texto diferente ocuparia uma entrada.
+        # O índice só é atualizado aqui, para não pesar nas outras rotas.
+        with self.lock:
+            self._recarregar_se_mudou()
+            if self.indice_assinatura != self.assinatura:
+                self.indice.atualizar(self.vendas)
+                self.indice_assinatura = self.assinatura
+            return self.indice.buscar(consulta, limite, inicio)
+
+
+# Servidor HTTP local (consultas para PDV, bot de cobrança etc.)
+#   GET /clientes/<cpf>/saldo
+#   GET /clientes/<cpf>/dividas
+#   GET /clientes/<cpf>/pagamentos
+#   GET /busca?q=<texto>&limite=100&inicio=0
+
+ROTAS_CLIENTE = {
+    'saldo': consultar_saldo,
+    'dividas': consultar_dividas_abertas,
+    'pagamentos': consultar_pagamentos,
+}
+
+class ApiHandler(BaseHTTPRequestHandler):
+    cache = None
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = [unquote(p) for p in url.path.split('/') if p]
+
+        if partes == ['busca']:
+            parametros = parse_qs(url.query)
+            consulta = parametros.get('q', [''])[0]
+            if not tokenizar(consulta):
+                self._responder(400, {'erro': 'Informe o texto da busca em ?q='})
+                return
+            try:
+                limite = int(parametros.get('limite', ['100'])[0])
+                inicio = int(parametros.get('inicio', ['0'])[0])
+            except ValueError:
+                limite, inicio = -1, -1
+            if not 1 <= limite <= API_MAX_LIMITE_BUSCA or inicio < 0:
+                self._responder(400, {'erro': f'limite deve estar entre 1 e {API_MAX_LIMITE_BUSCA} e inicio não pode ser negativo'})
+                return
+            self._responder(200, self.cache.buscar_observacoes(consulta, limite, inicio))
+            return
+
+        if len(partes) != 3 or partes[0] != 'clientes' or partes[2] not in ROTAS_CLIENTE:
+            self._responder(404, {'erro': 'Rota não encontrada'})
+            return
+
+        cpf = somente_digitos(partes[1])
+        if not cpf:
+            self._responder(400, {'erro': 'CPF inválido'})
+            return
+
+        rota = partes[2]
+        resultado = self.cache.consultar((rota, cpf), ROTAS_CLIENTE[rota], cpf)
+        if resultado is None:
+            self._responder(404, {'erro': 'Cliente não encontrado'})
+            return
+        self._responder(200, resultado)
+
+    def log_message(self, format, *args):
+        pass
+
+def iniciar_servidor_api(host=API_HOST, porta=API_PORTA, clientes_file=CLIENTES_FILE, vendas_file=VENDAS_FILE):
+    handler = type('ApiHandlerLoja', (ApiHandler,), {'cache': CacheConsultas(clientes_file, vendas_file)})
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
+
+# Extratos em lote (fechamento do mês)
+
+# Abaixo disso o custo de subir o pool de processos não compensa
+EXTRATOS_MINIMO_PARALELO = 200
+
+def dias_em_atraso(data_compra, hoje):
+    try:
+        return (hoje - datetime.strptime(data_compra, "%d/%m/%Y")).days
+    except (ValueError, TypeError):
+        return 0
+
+def calcular_saldos_clientes(clientes, vendas):
+    # Uma única passada em vendas, agrupando por CPF.
+    # Vendas de clientes sem CPF não são agrupadas (não há como saber se são
+    # do mesmo cliente) e voltam separadas para serem informadas.
+    por_cpf = {}
+    sem_cpf = []
+    for v in vendas:
+        cliente = v.get('cliente')
+        if not cliente:
+            continue
+        saldo = calcular_saldo(v)
+        if saldo <= 0:
+            continue
+        cpf = somente_digitos(cliente.get('cpf'))
+        if not cpf:
+            sem_cpf.append(v)
+            continue
+        item = por_cpf.setdefault(cpf, {'cliente': cliente, 'vendas_abertas': [], 'saldo': 0})
+        item['vendas_abertas'].append(v)
+        item['saldo'] += saldo
+
+    cadastro = {somente_digitos(c.get('cpf')): c for c in clientes}
+    for cpf, item in por_cpf.items():
+        item['cliente'] = cadastro.get(cpf, item['cliente'])
+        item['saldo'] = round(item['saldo'], 2)
+    return por_cpf, sem_cpf
+
+def montar_extrato_txt(cliente, vendas_abertas, saldo_total, emitido_em):
+    linhas = []
+    linhas.append("=========== EXTRATO DE DÍVIDAS EM ABERTO ===========")
+    linhas.append(f"Emitido em: {emitido_em}")
+    linhas.append("-----------------------------------------")
+    linhas.append(f"Cliente: {cliente.get('nome','')}")
+    linhas.append(f"CPF: {cliente.get('cpf','')}")
+    if cliente.get('telefone'):
+        linhas.append(f"Telefone: {cliente.get('telefone')}")
+    if cliente.get('endereco'):
+        linhas.append(f"Endereço: {cliente.get('endereco')}")
+    linhas.append("-----------------------------------------")
+
+    for venda in vendas_abertas:
+        linhas.append(f"ID Venda: {venda.get('id', 'SEM_ID')}")
+        linhas.append(f"Data Compra: {venda.get('data_compra')}")
+        linhas.append(f"VALOR ORIGINAL DA COMPRA: {formatar_moeda(venda.get('valor_total', 0))}")
+        if venda.get('observacao'):
+            linhas.append(f"Observação: {venda.get('observacao')}")
+        for p in venda.get('pagamentos', []):
+            linhas.append(f"  Pago {formatar_moeda(p.get('valor',0))} em {p.get('data_pagamento')} ({p.get('meio','')})")
+            if p.get('observacao'):
+                linhas.append(f"    Observação: {p.get('observacao')}")
+        linhas.append(f"Saldo desta compra: {formatar_moeda(calcular_saldo(venda))}")
+        linhas.append("-----------------------------------------")
+
+    linhas.append(f"SALDO DEVEDOR TOTAL: {formatar_moeda(saldo_total)}")
+    linhas.append("Favor comparecer à loja para regularizar o saldo.")
+    linhas.append("=========================================")
+    return "\n".join(linhas)
+
+def gravar_extratos(lote, destino, emitido_em, timestamp):
+    caminhos = []
+    for cpf, item in lote:
+        nome_cliente = item['cliente'].get('nome','').strip().replace(" ", "_")[:30] or "CLIENTE"
+        path = os.path.join(destino, f"extrato_{cpf}_{nome_cliente}_{timestamp}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(montar_extrato_txt(item['cliente'], item['vendas_abertas'], item['saldo'], emitido_em))
+        caminhos.append(os.path.abspath(path))
+    return caminhos
+
+def gerar_extratos_lote(saldo_minimo=0.01, dias_atraso=0, processos=None,
+                        clientes_file=CLIENTES_FILE, vendas_file=VENDAS_FILE, destino=EXTRATOS_DIR):
+    os.makedirs(destino, exist_ok=True)
+    agora = datetime.now()
+    emitido_em = agora.strftime('%d/%m/%Y %H:%M:%S')
+    timestamp = agora.strftime("%Y%m%d_%H%M%S")
+
+    saldos, sem_cpf = calcular_saldos_clientes(load_json(clientes_file), load_json(vendas_file))
+    for v in sem_cpf:
+        print(f"Extrato não gerado: venda {v.get('id', 'SEM_ID')} de {v['cliente'].get('nome','')} sem CPF do cliente")
+    selecionados = [
+        (cpf, item) for cpf, item in saldos.items()
+        if item['saldo'] >= saldo_minimo
+        and max(dias_em_atraso(v.get('data_compra'), agora) for v in item['vendas_abertas']) >= dias_atraso
+    ]
+
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(selecionados) < EXTRATOS_MINIMO_PARALELO:
+        return gravar_extratos(selecionados, destino, emitido_em, timestamp)
+
+    # Lotes grandes por processo para reduzir a troca de dados entre processos
+    tamanho = math.ceil(len(selecionados) / (processos * 4))
+    lotes = [selecionados[i:i + tamanho] for i in range(0, len(selecionados), tamanho)]
+    caminhos = []
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        for resultado in pool.map(gravar_extratos, lotes, [destino] * len(lotes),
+                                  [emitido_em] * len(lotes), [timestamp] * len(lotes)):
+            caminhos.extend(resultado)
+    return caminhos
+
+
+# Sincronização entre lojas
+# Cada loja tem um identificador fixo (--loja) e cada venda leva a loja onde
+# foi criada e o id original (loja_origem/id_origem); é essa dupla que casa
+# a venda em qualquer loja, mesmo que o 'id' local precise ser outro.
+# Os pacotes são numerados por destino e trazem a confirmação do último
+# pacote recebido daquela loja. Enquanto um registro não é confirmado, ele
+# volta em todo pacote seguinte, então um pacote perdido não perde dados.
+# A importação é idempotente: clientes são casados pelo CPF e pagamentos são
+# unidos sem duplicar os que já existem.
+
+CAMPOS_VENDA_SYNC = ('valor_total', 'data_compra', 'observacao')
+
+def hash_registro(registro):
+    texto = json.dumps(registro, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+def hash_venda(venda):
+    # O 'id' local pode ser diferente em cada loja e não entra na comparação.
+    # O cliente entra só pelo CPF: cada loja guarda na venda o seu próprio
+    # cadastro, e mudanças no cadastro viajam na lista de clientes.
+    registro = {k: v for k, v in venda.items() if k != 'id'}
+    registro['cliente'] = somente_digitos(venda.get('cliente', {}).get('cpf'))
+    return hash_registro(registro)
+
+def chave_pagamento(p):
+    return (p.get('valor'), p.get('data_pagamento'), p.get('meio'), p.get('observacao'))
+
+def chave_venda_sync(venda, loja_id):
+    # Vendas ainda sem origem foram criadas nesta loja
+    return f"v:{venda.get('loja_origem') or loja_id}:{venda.get('id_origem') or venda.get('id')}"
+
+def carregar_estado_sync(dados_dir, loja_id=None):
+    path = os.path.join(dados_dir, SYNC_ESTADO_FILE)
+    estado = load_json(path) if os.path.exists(path) else {}
+    if not isinstance(estado, dict):
+        estado = {}
+    atual = estado.get('loja_id')
+    if atual and loja_id and loja_id != atual:
+        raise ValueError(f"Esta instalação já está registrada como loja '{atual}' e não pode virar '{loja_id}'")
+    if not atual and not loja_id:
+        raise ValueError("Informe o identificador desta loja com --loja na primeira sincronização")
+    estado['loja_id'] = atual or loja_id
+    estado.setdefault('pares', {})
+    return estado
+
+def estado_par(estado, loja):
+    return estado['pares'].setdefault(loja, {
+        'seq_enviado': 0,     # último pacote gerado para a loja
+        'seq_recebido': 0,    # último pacote da loja aplicado aqui
+        'confirmado': {},     # chave -> hash que a loja já tem
+        'pendentes': {}       # seq -> {chave: hash} enviados e ainda sem confirmação
+    })
+
+def aplicar_confirmacao(par, seq_confirmado):
+    for seq in sorted(par['pendentes'], key=int):
+        if int(seq) > seq_confirmado:
+            break
+        par['confirmado'].update(par['pendentes'].pop(seq))
+
+def exportar_alteracoes(destino_loja, dados_dir='.', saida=None, loja_id=None):
+    estado = carregar_estado_sync(dados_dir, loja_id)
+    if destino_loja == estado['loja_id']:
+        raise ValueError("A loja de destino não pode ser a própria loja")
+    par = estado_par(estado, destino_loja)
+
+    # Marca a origem das vendas criadas aqui; a partir daí a identidade não muda.
+    # Vendas antigas sem id recebem um antes, como em buscar_debitos_simples.
+    vendas_path = os.path.join(dados_dir, VENDAS_FILE)
+    vendas_locais = load_json(vendas_path)
+    marcadas = False
+    for v in vendas_locais:
+        if not v.get('id'):
+            v['id'] = str(uuid.uuid4())[:8]
+        if not v.get('loja_origem'):
+            v['loja_origem'] = estado['loja_id']
+            v['id_origem'] = v['id']
+            marcadas = True
+    if marcadas:
+        save_json(vendas_locais, vendas_path)
+
+    # Delta contra o que o destino já confirmou: envios sem confirmação são repetidos
+    clientes, vendas, enviados = [], [], {}
+    for c in load_json(os.path.join(dados_dir, CLIENTES_FILE)):
+        chave, h = f"c:{somente_digitos(c.get('cpf'))}", hash_registro(c)
+        if par['confirmado'].get(chave) != h:
+            clientes.append(c)
+            enviados[chave] = h
+    for v in vendas_locais:
+        chave, h = chave_venda_sync(v, estado['loja_id']), hash_venda(v)
+        if par['confirmado'].get(chave) != h:
+            vendas.append(v)
+            enviados[chave] = h
+
+    par['seq_enviado'] += 1
+    pacote = {
+        'formato': 2,
+        'origem': estado['loja_id'],
+        'destino': destino_loja,
+        'seq': par['seq_enviado'],
+        'confirma': par['seq_recebido'],
+        'gerado_em': datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        'clientes': clientes,
+        'vendas': vendas
+    }
+    if saida is None:
+        saida = os.path.join(dados_dir, f"sync_{estado['loja_id']}_para_{destino_loja}_{par['seq_enviado']:06d}.json.gz")
+    with gzip.open(saida, 'wt', encoding='utf-8') as f:
+        json.dump(pacote, f, ensure_ascii=False, separators=(',', ':'))
+
+    # Só grava o estado depois que o pacote foi escrito
+    par['pendentes'][str(par['seq_enviado'])] = enviados
+    save_json(estado, os.path.join(dados_dir, SYNC_ESTADO_FILE))
+    return {'arquivo': os.path.abspath(saida), 'seq': par['seq_enviado'], 'clientes': len(clientes), 'vendas': len(vendas)}
+
+def mesclar_cliente(local, remoto, conflitos, origem):
+    alterado = False
+    for campo, valor in remoto.items():
+        # O CPF já casou pelos dígitos; só a formatação pode ser diferente
+        if campo == 'cpf':
+            continue
+        if not local.get(campo) and valor:
+            local[campo] = valor
+            alterado = True
+        elif valor and local.get(campo) != valor:
+            conflitos.append({'loja': origem, 'tipo': 'cliente', 'chave': local.get('cpf'),
+                              'campo': campo, 'local': local.get(campo), 'remoto': valor})
+    return alterado
+
+def mesclar_venda(local, remota, conflitos, origem):
+    for campo in CAMPOS_VENDA_SYNC:
+        if local.get(campo) != remota.get(campo):
+            conflitos.append({'loja': origem, 'tipo': 'venda', 'chave': local['id'],
+                              'campo': campo, 'local': local.get(campo), 'remoto': remota.get(campo)})
+
+    # Pagamentos são só acrescentados; conta repetições para não perder
+    # dois pagamentos iguais feitos de verdade.
+    pagamentos = local.setdefault('pagamentos', [])
+    existentes = Counter(chave_pagamento(p) for p in pagamentos)
+    alterado = False
+    for p in remota.get('pagamentos', []):
+        chave = chave_pagamento(p)
+        if existentes[chave] > 0:
+            existentes[chave] -= 1
+        else:
+            pagamentos.append(p)
+            alterado = True
+
+    if alterado and calcular_saldo(local) < 0:
+        conflitos.append({'loja': origem, 'tipo': 'venda', 'chave': local['id'],
+                          'campo': 'pagamentos', 'local': 'saldo negativo após sincronização',
+                          'remoto': calcular_saldo(local)})
+    return alterado
+
+def importar_alteracoes(arquivo, dados_dir='.', loja_id=None):
+    with gzip.open(arquivo, 'rt', encoding='utf-8') as f:
+        pacote = json.load(f)
+
+    estado = carregar_estado_sync(dados_dir, loja_id)
+    origem = pacote.get('origem')
+    if pacote.get('formato') != 2 or not origem or origem == estado['loja_id']:
+        raise ValueError(f"Pacote de sincronização inválido ou da própria loja: {arquivo}")
+    if pacote.get('destino') != estado['loja_id']:
+        raise ValueError(f"Pacote destinado à loja '{pacote.get('destino')}', não a '{estado['loja_id']}'")
+    par = estado_par(estado, origem)
+    # A confirmação vem antes da mesclagem: os hashes gravados abaixo, do que
+    # as duas lojas já têm igual, são mais novos que os pendentes confirmados.
+    aplicar_confirmacao(par, pacote.get('confirma', 0))
+
+    clientes_path = os.path.join(dados_dir, CLIENTES_FILE)
+    vendas_path = os.path.join(dados_dir, VENDAS_FILE)
+    clientes = load_json(clientes_path)
+    vendas = load_json(vendas_path)
+    clientes_por_cpf = {somente_digitos(c.get('cpf')): c for c in clientes}
+    vendas_por_chave = {chave_venda_sync(v, estado['loja_id']): v for v in vendas if v.get('id')}
+    ids_locais = {v['id'] for v in vendas if v.get('id')}
+
+    resumo = {'clientes_novos': 0, 'clientes_atualizados': 0, 'vendas_novas': 0, 'vendas_atualizadas': 0, 'conflitos': 0}
+    conflitos = []
+
+    for remoto in pacote.get('clientes', []):
+        cpf = somente_digitos(remoto.get('cpf'))
+        local = clientes_por_cpf.get(cpf)
+        if local is None:
+            local = dict(remoto)
+            clientes.append(local)
+            clientes_por_cpf[cpf] = local
+            resumo['clientes_novos'] += 1
+        elif mesclar_cliente(local, remoto, conflitos, origem):
+            resumo['clientes_atualizados'] += 1
+        # A outra loja já tem este registro; não precisa devolvê-lo
+        if hash_registro(local) == hash_registro(remoto):
+            par['confirmado'][f"c:{cpf}"] = hash_registro(local)
+
+    for remota in pacote.get('vendas', []):
+        if not remota.get('loja_origem') or not remota.get('id_origem'):
+            continue
+        chave = chave_venda_sync(remota, estado['loja_id'])
+        local = vendas_por_chave.get(chave)
+
+        if local is None:
+            # O 'id' local só muda se já estiver em uso aqui; o novo id depende
+            # apenas da origem da venda, nunca de quem repassou o pacote.
+            venda_id = remota['id_origem']
+            if venda_id in ids_locais:
+                venda_id = f"{remota['id_origem']}-{remota['loja_origem']}"
+            local = dict(remota, id=venda_id, pagamentos=list(remota.get('pagamentos', [])))
+            # A venda passa a apontar para o cadastro desta loja (o CPF pode
+            # estar escrito de outro jeito aqui), como a aba Pagamentos espera
+            cpf = somente_digitos(remota.get('cliente', {}).get('cpf'))
+            if cpf and cpf not in clientes_por_cpf:
+                novo = dict(remota['cliente'])
+                clientes.append(novo)
+                clientes_por_cpf[cpf] = novo
+                resumo['clientes_novos'] += 1
+            if cpf:
+                local['cliente'] = dict(clientes_por_cpf[cpf])
+            vendas.append(local)
+            vendas_por_chave[chave] = local
+            ids_locais.add(venda_id)
+            resumo['vendas_novas'] += 1
+        elif mesclar_venda(local, remota, conflitos, origem):
+            resumo['vendas_atualizadas'] += 1
+        if hash_venda(local) == hash_venda(remota):
+            par['confirmado'][chave] = hash_venda(local)
+
+    if resumo['clientes_novos'] or resumo['clientes_atualizados']:
+        save_json(clientes, clientes_path)
+    if resumo['vendas_novas'] or resumo['vendas_atualizadas']:
+        save_json(vendas, vendas_path)
+    if conflitos:
+        # Reimportar o mesmo pacote não repete conflitos já registrados
+        conflitos_path = os.path.join(dados_dir, SYNC_CONFLITOS_FILE)
+        registrados = load_json(conflitos_path)
+        novos = [c for c in conflitos if c not in registrados]
+        if novos:
+            save_json(registrados + novos, conflitos_path)
+        resumo['conflitos'] = len(novos)
+
+    par['seq_recebido'] = max(par['seq_recebido'], pacote.get('seq', 0))
+    save_json(estado, os.path.join(dados_dir, SYNC_ESTADO_FILE))
+    return resumo
+
 
 # Aplicação Flet
 
@@ -152,6 +871,12 @@ def main(page: ft.Page):
     
     # Funções utilitárias
     
+    indice_observacoes = IndiceObservacoes()
+
+    def gravar_vendas(vendas, alteradas):
+        # Mantém o índice da aba Busca em dia sem reler vendas.json
+        indice_observacoes.gravar_vendas(vendas, alteradas, VENDAS_FILE)
+
     def mostrar_mensagem(mensagem, cor="blue"):
         page.snack_bar = ft.SnackBar(ft.Text(mensagem), bgcolor=cor)
         page.snack_bar.open = True
@@ -290,7 +1015,7 @@ def main(page: ft.Page):
             def salvar_e_fechar(e):
                 vendas = load_json(VENDAS_FILE)
                 vendas.append(nova_venda)
-                save_json(vendas, VENDAS_FILE)
+                gravar_vendas(vendas, [(len(vendas) - 1, nova_venda)])
                 
                 caminho = gerar_cupom_txt(nova_venda, tipo="venda", saldo_devedor=valor)
                 mostrar_mensagem(f"Venda salva! Dívida de {formatar_moeda(valor)}. Cupom: {caminho}", "green")
@@ -430,7 +1155,7 @@ def main(page: ft.Page):
                 })
         
         # 4. Salvar e Recalcular Saldo Total
-        save_json(vendas, VENDAS_FILE)
+        gravar_vendas(vendas, [(item['index'], vendas[item['index']]) for item in vendas_do_cliente_em_aberto])
         
         # Recalcular o saldo total após a atualização
         novo_saldo_total = sum(calcular_saldo(v) for v in vendas if v.get('cliente', {}).get('cpf') == cliente_selecionado_dividas['cpf'])
@@ -495,13 +1220,15 @@ def main(page: ft.Page):
         
         # 2. Processar Dívidas
         vendas_cliente = []
-        for v in vendas:
+        alteradas = []
+        for i, v in enumerate(vendas):
             if v.get('cliente') and v['cliente'].get('cpf') == cliente_selecionado_dividas['cpf']:
                 if 'id' not in v: v['id'] = str(uuid.uuid4())[:8]
                 if 'pagamentos' not in v: v['pagamentos'] = []
                 vendas_cliente.append(v)
+                alteradas.append((i, v))
         
-        save_json(vendas, VENDAS_FILE)
+        gravar_vendas(vendas, alteradas)
 
         # 3. Calcular Saldo TOTAL
         saldo_total = sum(calcular_saldo(v) for v in vendas_cliente)
@@ -713,6 +1440,87 @@ def main(page: ft.Page):
     ], spacing=20, scroll=ft.ScrollMode.ADAPTIVE)
 
     
+    # ABA 4: BUSCA NAS OBSERVAÇÕES
+    
+    busca_obs_field = ft.TextField(label="Digite um trecho da observação (ex: geladeira)", width=500,
+                                   border_color=ft.Colors.ORANGE, on_submit=lambda e: buscar_observacoes(e))
+    container_resultados_busca = ft.Column([], scroll=ft.ScrollMode.ADAPTIVE, height=500)
+
+    def buscar_observacoes(e):
+        consulta = busca_obs_field.value.strip()
+        container_resultados_busca.controls.clear()
+
+        if not tokenizar(consulta):
+            mostrar_mensagem("Digite um texto para buscar", "orange")
+            page.update()
+            return
+
+        # Só relê vendas.json se ele foi alterado fora de gravar_vendas;
+        # mesmo assim, só vendas novas ou alteradas são reindexadas
+        indice_observacoes.atualizar_do_arquivo(VENDAS_FILE)
+        busca = indice_observacoes.buscar(consulta)
+        resultados = busca['resultados']
+
+        if not resultados:
+            container_resultados_busca.controls.append(
+                ft.Text("Nenhuma observação encontrada.", size=16, color=ft.Colors.GREY_600)
+            )
+            page.update()
+            return
+
+        container_resultados_busca.controls.append(
+            ft.Text(f"{busca['total']} resultado(s)" if busca['total'] == len(resultados)
+                    else f"Mostrando {len(resultados)} de {busca['total']} resultados - refine a busca",
+                    size=14, weight=ft.FontWeight.BOLD, color=ft.Colors.ORANGE_800)
+        )
+        for r in resultados:
+            if r['tipo'] == 'venda':
+                detalhe = f"🛒 Venda de {formatar_moeda(r['valor_total'])} em {r['data_compra']}"
+            else:
+                detalhe = f"💰 Pagamento de {formatar_moeda(r['valor_pago'])} em {r['data_pagamento']} ({r['meio']})"
+            container_resultados_busca.controls.append(
+                ft.Card(
+                    content=ft.Container(
+                        content=ft.Column([
+                            ft.Row([
+                                ft.Text(f"VENDA #{r['venda_id'] or 'SEM ID'} - {r['cliente']}", weight=ft.FontWeight.BOLD, size=14),
+                                ft.Text(f"Saldo: {formatar_moeda(r['saldo'])}",
+                                        color=ft.Colors.RED if r['saldo'] > 0 else ft.Colors.GREEN, weight=ft.FontWeight.BOLD),
+                            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                            ft.Text(f"CPF: {r['cpf']}", size=12, color=ft.Colors.GREY_600),
+                            ft.Text(detalhe, size=12),
+                            ft.Text(f"📝 {r['observacao']}", size=12, color=ft.Colors.GREY_700),
+                        ]),
+                        padding=15
+                    )
+                )
+            )
+        page.update()
+
+    aba_busca = ft.Column([
+        ft.Text("🔎 Buscar nas Observações", size=24, weight=ft.FontWeight.BOLD, color=ft.Colors.ORANGE),
+        ft.Card(
+            content=ft.Container(
+                content=ft.Column([
+                    ft.Text("Vendas e pagamentos de todos os clientes", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Row([
+                        busca_obs_field,
+                        ft.ElevatedButton("🔎 BUSCAR", on_click=buscar_observacoes, bgcolor=ft.Colors.ORANGE, color=ft.Colors.WHITE, style=ft.ButtonStyle(padding=15))
+                    ], spacing=10),
+                ]),
+                padding=20
+            )
+        ),
+        ft.Card(
+            content=ft.Container(
+                content=container_resultados_busca,
+                padding=20
+            ),
+            expand=True
+        )
+    ], spacing=20)
+
+    
     # LAYOUT PRINCIPAL
     
     tabs = ft.Tabs(
@@ -721,6 +1529,7 @@ def main(page: ft.Page):
             ft.Tab(text="👥 Clientes", content=aba_cadastro), 
             ft.Tab(text="🛒 Dívidas (Vendas)", content=aba_vendas), 
             ft.Tab(text="💰 Pagamentos", content=aba_dividas), 
+            ft.Tab(text="🔎 Busca", content=aba_busca), 
         ],
         expand=1
     )
@@ -728,5 +1537,58 @@ def main(page: ft.Page):
     page.add(tabs)
 
 # Executar aplicação
+
+def inteiro_positivo(valor):
+    numero = int(valor)
+    if numero < 1:
+        raise argparse.ArgumentTypeError("deve ser um número inteiro maior que zero")
+    return numero
+
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    # Necessário no executável do PyInstaller para os processos dos extratos
+    freeze_support()
+    parser = argparse.ArgumentParser(description="Sistema de Gestão de Vendas")
+    parser.add_argument('--api', action='store_true', help="Inicia apenas a API HTTP local de consultas")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--porta', type=int, default=API_PORTA)
+    parser.add_argument('--extratos', action='store_true', help="Gera extratos de todos os clientes com saldo em aberto")
+    parser.add_argument('--saldo-minimo', type=float, default=0.01)
+    parser.add_argument('--dias-atraso', type=int, default=0)
+    parser.add_argument('--processos', type=inteiro_positivo, default=None)
+    parser.add_argument('--exportar-sync', metavar='LOJA_DESTINO', help="Exporta as alterações ainda não confirmadas pela loja")
+    parser.add_argument('--importar-sync', metavar='ARQUIVO', help="Importa um pacote de alterações de outra loja")
+    parser.add_argument('--saida', default=None, help="Arquivo do pacote exportado")
+    parser.add_argument('--dados', default='.', help="Pasta com clientes.json e vendas.json (sincronização, extratos e API)")
+    parser.add_argument('--loja', default=None, help="Identificador fixo desta loja (obrigatório na primeira sincronização)")
+    args = parser.parse_args()
+
+    clientes_file = os.path.join(args.dados, CLIENTES_FILE)
+    vendas_file = os.path.join(args.dados, VENDAS_FILE)
+
+    if args.exportar_sync:
+        try:
+            resultado = exportar_alteracoes(args.exportar_sync, args.dados, args.saida, args.loja)
+        except (ValueError, OSError) as e:
+            print(f"Erro: {e}")
+        else:
+            print(f"Pacote {resultado['seq']}: {resultado['clientes']} clientes e {resultado['vendas']} vendas exportados em {resultado['arquivo']}")
+    elif args.importar_sync:
+        try:
+            resumo = importar_alteracoes(args.importar_sync, args.dados, args.loja)
+        except (ValueError, OSError) as e:
+            print(f"Erro: {e}")
+        else:
+            print(", ".join(f"{k}: {v}" for k, v in resumo.items()))
+    elif args.extratos:
+        extratos_dir = os.path.join(args.dados, EXTRATOS_DIR)
+        caminhos = gerar_extratos_lote(args.saldo_minimo, args.dias_atraso, args.processos, clientes_file, vendas_file, extratos_dir)
+        print(f"{len(caminhos)} extratos gerados em {os.path.abspath(extratos_dir)}")
+    elif args.api:
+        servidor = iniciar_servidor_api(args.host, args.porta, clientes_file, vendas_file)
+        print(f"API de consultas em http://{args.host}:{args.porta}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            servidor.server_close()
+    else:
+        ft.app(target=main)
\ No newline at end of file
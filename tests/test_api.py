@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import programa_loja as pl
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.clientes_file = os.path.join(self.tmp.name, pl.CLIENTES_FILE)
+        self.vendas_file = os.path.join(self.tmp.name, pl.VENDAS_FILE)
+
+        ana = {'nome': 'Ana', 'cpf': '123.456.789-00', 'telefone': '1'}
+        pl.save_json([ana], self.clientes_file)
+        pl.save_json([
+            {'id': 'a1', 'cliente': ana, 'valor_total': 100, 'data_compra': '01/01/2025', 'observacao': '',
+             'pagamentos': [{'valor': 30, 'data_pagamento': '02/01/2025 10:00', 'meio': 'PIX', 'observacao': ''}]},
+            {'id': 'a2', 'cliente': ana, 'valor_total': 20, 'data_compra': '03/01/2025', 'observacao': 'Geladeira',
+             'pagamentos': [{'valor': 20, 'data_pagamento': '04/01/2025 10:00', 'meio': 'DINHEIRO', 'observacao': ''}]},
+        ], self.vendas_file)
+
+        self.servidor = pl.iniciar_servidor_api('127.0.0.1', 0, self.clientes_file, self.vendas_file)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+    def get(self, caminho):
+        url = f"http://127.0.0.1:{self.servidor.server_address[1]}{caminho}"
+        try:
+            with urllib.request.urlopen(url) as resposta:
+                return resposta.status, json.loads(resposta.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read().decode('utf-8'))
+
+    def test_rotas_do_cliente(self):
+        status, saldo = self.get('/clientes/123.456.789-00/saldo')
+        self.assertEqual(status, 200)
+        self.assertEqual(saldo['saldo_devedor'], 70)
+
+        status, dividas = self.get('/clientes/12345678900/dividas')
+        self.assertEqual(status, 200)
+        self.assertEqual([d['id'] for d in dividas], ['a1'])
+
+        status, pagamentos = self.get('/clientes/12345678900/pagamentos')
+        self.assertEqual(status, 200)
+        self.assertEqual([p['venda_id'] for p in pagamentos], ['a1', 'a2'])
+
+    def test_erros(self):
+        self.assertEqual(self.get('/clientes/99999999999/saldo')[0], 404)
+        self.assertEqual(self.get('/clientes/12345678900/outra')[0], 404)
+        self.assertEqual(self.get('/nada')[0], 404)
+        self.assertEqual(self.get('/clientes/abc/saldo')[0], 400)
+
+    def test_busca(self):
+        status, busca = self.get('/busca?q=geladeira&limite=10')
+        self.assertEqual(status, 200)
+        self.assertEqual(busca['total'], 1)
+        self.assertEqual(busca['resultados'][0]['venda_id'], 'a2')
+        self.assertEqual(self.get('/busca?q=')[0], 400)
+        self.assertEqual(self.get('/busca?q=geladeira&limite=0')[0], 400)
+
+    def test_gravacao_descarta_cache(self):
+        self.assertEqual(self.get('/clientes/12345678900/saldo')[1]['saldo_devedor'], 70)
+
+        vendas = pl.load_json(self.vendas_file)
+        vendas[0]['pagamentos'].append({'valor': 70, 'data_pagamento': '05/01/2025 10:00', 'meio': 'PIX', 'observacao': ''})
+        pl.save_json(vendas, self.vendas_file)
+
+        self.assertEqual(self.get('/clientes/12345678900/saldo')[1]['saldo_devedor'], 0)
+        self.assertEqual(self.get('/clientes/12345678900/dividas')[1], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
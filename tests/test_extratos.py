@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import programa_loja as pl
+
+
+def data_ha(dias):
+    return (datetime.now() - timedelta(days=dias)).strftime("%d/%m/%Y")
+
+def venda(venda_id, dono, valor, dias, pago=0):
+    pagamentos = [{'valor': pago, 'data_pagamento': 'x', 'meio': 'PIX', 'observacao': ''}] if pago else []
+    return {'id': venda_id, 'cliente': dono, 'valor_total': valor, 'data_compra': data_ha(dias),
+            'observacao': '', 'pagamentos': pagamentos}
+
+
+class TestExtratos(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.clientes_file = os.path.join(self.tmp.name, pl.CLIENTES_FILE)
+        self.vendas_file = os.path.join(self.tmp.name, pl.VENDAS_FILE)
+        self.destino = os.path.join(self.tmp.name, pl.EXTRATOS_DIR)
+
+        ana = {'nome': 'Ana', 'cpf': '111.111.111-11'}
+        bia = {'nome': 'Bia', 'cpf': '222.222.222-22'}
+        caio = {'nome': 'Caio', 'cpf': '333.333.333-33'}
+        pl.save_json([ana, bia, caio], self.clientes_file)
+        pl.save_json([
+            venda('a1', ana, 100, 60),
+            venda('a2', ana, 50, 5),
+            venda('b1', bia, 30, 90, pago=10),
+            venda('c1', caio, 40, 10, pago=40),
+            venda('s1', {'nome': 'Sem A', 'cpf': ''}, 10, 60),
+            venda('s2', {'nome': 'Sem B'}, 10, 60),
+        ], self.vendas_file)
+
+    def gerar(self, **filtros):
+        caminhos = pl.gerar_extratos_lote(processos=1, clientes_file=self.clientes_file,
+                                          vendas_file=self.vendas_file, destino=self.destino, **filtros)
+        return sorted(os.path.basename(c).split('_')[1] for c in caminhos)
+
+    def test_todos_com_saldo(self):
+        self.assertEqual(self.gerar(), ['11111111111', '22222222222'])
+
+    def test_saldo_minimo(self):
+        self.assertEqual(self.gerar(saldo_minimo=100), ['11111111111'])
+
+    def test_dias_atraso_pela_compra_mais_antiga(self):
+        self.assertEqual(self.gerar(dias_atraso=80), ['22222222222'])
+        self.assertEqual(self.gerar(dias_atraso=120), [])
+
+    def test_vendas_sem_cpf_nao_sao_agrupadas(self):
+        saldos, sem_cpf = pl.calcular_saldos_clientes(pl.load_json(self.clientes_file), pl.load_json(self.vendas_file))
+        self.assertNotIn('', saldos)
+        self.assertEqual([v['id'] for v in sem_cpf], ['s1', 's2'])
+
+    def test_conteudo_do_extrato(self):
+        saldos, _ = pl.calcular_saldos_clientes(pl.load_json(self.clientes_file), pl.load_json(self.vendas_file))
+        item = saldos['11111111111']
+        texto = pl.montar_extrato_txt(item['cliente'], item['vendas_abertas'], item['saldo'], 'agora')
+        self.assertIn("ID Venda: a1", texto)
+        self.assertIn("ID Venda: a2", texto)
+        self.assertIn("SALDO DEVEDOR TOTAL: R$ 150,00", texto)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import programa_loja as pl
+
+
+def venda(venda_id, observacao, pagamentos=()):
+    v = {'cliente': {'nome': 'Ana', 'cpf': '111'}, 'valor_total': 100, 'data_compra': '01/01/2025',
+         'observacao': observacao,
+         'pagamentos': [{'valor': 10, 'data_pagamento': 'x', 'meio': 'PIX', 'observacao': o} for o in pagamentos]}
+    if venda_id:
+        v['id'] = venda_id
+    return v
+
+def ids(busca):
+    return [(r['venda_id'], r['tipo']) for r in busca['resultados']]
+
+
+class TestIndiceObservacoes(unittest.TestCase):
+    def setUp(self):
+        self.indice = pl.IndiceObservacoes()
+        self.vendas = [
+            venda('v1', 'Geladeira Brastemp', ['ref NF 123']),
+            venda('v2', 'Fogão', ['entrada geladeira']),
+            venda('v3', 'Microondas'),
+        ]
+        self.indice.atualizar(self.vendas)
+
+    def test_acentos_e_maiusculas(self):
+        self.assertEqual(ids(self.indice.buscar('FOGAO')), [('v2', 'venda')])
+        self.assertEqual(ids(self.indice.buscar('geladeíra')), [('v1', 'venda'), ('v2', 'pagamento')])
+
+    def test_prefixo_so_no_ultimo_termo(self):
+        self.assertEqual(ids(self.indice.buscar('geladeira bras')), [('v1', 'venda')])
+        self.assertEqual(ids(self.indice.buscar('gelad brastemp')), [])
+
+    def test_observacao_alterada_e_reindexada(self):
+        self.vendas[2]['observacao'] = 'Geladeira usada'
+        self.vendas[0]['observacao'] = 'Lavadora'
+        self.indice.atualizar(self.vendas)
+        self.assertEqual(ids(self.indice.buscar('geladeira')), [('v2', 'pagamento'), ('v3', 'venda')])
+        self.assertEqual(ids(self.indice.buscar('lav')), [('v1', 'venda')])
+        self.assertEqual(ids(self.indice.buscar('brastemp')), [])
+
+    def test_venda_removida(self):
+        self.indice.atualizar(self.vendas[1:])
+        self.assertEqual(ids(self.indice.buscar('brastemp')), [])
+        self.assertEqual(self.indice._termos_com_prefixo('bras'), [])
+
+    def test_vocabulario_acompanha_termos_novos(self):
+        self.assertEqual(ids(self.indice.buscar('torr')), [])
+        self.vendas.append(venda('v4', 'Torradeira'))
+        self.indice.atualizar(self.vendas)
+        self.assertEqual(ids(self.indice.buscar('torr')), [('v4', 'venda')])
+
+    def test_venda_sem_id(self):
+        self.vendas.append(venda(None, 'geladeira sem id'))
+        self.indice.atualizar(self.vendas)
+        self.assertIn((None, 'venda'), ids(self.indice.buscar('geladeira')))
+
+        # Quando a venda ganha id, não aparece duas vezes
+        self.vendas[3]['id'] = 'v4'
+        self.indice.indexar_venda(self.vendas[3], 3)
+        self.assertEqual(ids(self.indice.buscar('sem id')), [('v4', 'venda')])
+
+    def test_limite_e_total(self):
+        busca = self.indice.buscar('geladeira', limite=1)
+        self.assertEqual(busca['total'], 2)
+        self.assertEqual(ids(busca), [('v1', 'venda')])
+        self.assertEqual(ids(self.indice.buscar('geladeira', limite=1, inicio=1)), [('v2', 'pagamento')])
+
+
+class TestGravarVendas(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.vendas_file = os.path.join(self.tmp.name, pl.VENDAS_FILE)
+        pl.save_json([venda('v1', 'Geladeira')], self.vendas_file)
+        self.indice = pl.IndiceObservacoes()
+        self.indice.atualizar_do_arquivo(self.vendas_file)
+
+    def test_gravacao_atualiza_indice_sem_reler(self):
+        vendas = pl.load_json(self.vendas_file)
+        vendas.append(venda('v2', 'Fogão'))
+        self.indice.gravar_vendas(vendas, [(1, vendas[1])], self.vendas_file)
+        self.assertEqual(self.indice.assinatura, pl.assinatura_arquivo(self.vendas_file))
+        self.assertEqual(ids(self.indice.buscar('fogao')), [('v2', 'venda')])
+
+    def test_alteracao_externa_e_relida(self):
+        vendas = pl.load_json(self.vendas_file)
+        vendas.append(venda('v3', 'Alterado por outro processo'))
+        pl.save_json(vendas, self.vendas_file)
+
+        vendas.append(venda('v4', 'Fogão'))
+        self.indice.gravar_vendas(vendas, [(2, vendas[2])], self.vendas_file)
+        self.assertEqual(ids(self.indice.buscar('processo')), [])
+
+        self.indice.atualizar_do_arquivo(self.vendas_file)
+        self.assertEqual(ids(self.indice.buscar('processo')), [('v3', 'venda')])
+        self.assertEqual(ids(self.indice.buscar('fogao')), [('v4', 'venda')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import programa_loja as pl
+
+
+def cliente(nome, cpf):
+    return {'nome': nome, 'cpf': cpf, 'telefone': '1', 'apelido': '', 'endereco': ''}
+
+def venda(venda_id, dono, valor):
+    return {'id': venda_id, 'cliente': dono, 'valor_total': valor, 'data_compra': '01/01/2025',
+            'observacao': '', 'pagamentos': []}
+
+
+class TestSincronizacao(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def loja(self, nome, clientes, vendas):
+        pasta = os.path.join(self.tmp.name, nome)
+        os.makedirs(pasta)
+        pl.save_json(clientes, os.path.join(pasta, pl.CLIENTES_FILE))
+        pl.save_json(vendas, os.path.join(pasta, pl.VENDAS_FILE))
+        return pasta
+
+    def enviar(self, origem, destino, loja_origem, loja_destino):
+        pacote = pl.exportar_alteracoes(loja_destino, origem, loja_id=loja_origem)
+        pl.importar_alteracoes(pacote['arquivo'], destino, loja_id=loja_destino)
+        return pacote
+
+    def saldo(self, pasta, cpf):
+        vendas = pl.load_json(os.path.join(pasta, pl.VENDAS_FILE))
+        return sum(pl.calcular_saldo(v) for v in pl.vendas_do_cliente(vendas, cpf))
+
+    def test_duas_lojas_ida_e_volta(self):
+        ana = cliente('Ana', '111')
+        a = self.loja('A', [ana], [venda('v1', ana, 100)])
+        b = self.loja('B', [], [])
+
+        self.enviar(a, b, 'A', 'B')
+        vendas_b = pl.load_json(os.path.join(b, pl.VENDAS_FILE))
+        vendas_b[0]['pagamentos'].append({'valor': 40, 'data_pagamento': 'x', 'meio': 'PIX', 'observacao': ''})
+        pl.save_json(vendas_b, os.path.join(b, pl.VENDAS_FILE))
+        self.enviar(b, a, 'B', 'A')
+
+        self.assertEqual(self.saldo(a, '111'), 60)
+        self.assertEqual(self.saldo(b, '111'), 60)
+
+        # As duas lojas já têm a mesma versão: nada precisa ir nem voltar
+        self.assertEqual(self.enviar(a, b, 'A', 'B')['vendas'], 0)
+        self.assertEqual(pl.exportar_alteracoes('A', b)['vendas'], 0)
+
+    def test_cpf_escrito_de_formas_diferentes(self):
+        a = self.loja('A', [cliente('Ana', '111.222.333-44')], [venda('v1', cliente('Ana', '111.222.333-44'), 80)])
+        ana_b = cliente('Ana', '11122233344')
+        b = self.loja('B', [ana_b], [])
+
+        self.enviar(a, b, 'A', 'B')
+
+        # A aba Pagamentos compara o CPF exatamente como está no cadastro
+        vendas_b = pl.load_json(os.path.join(b, pl.VENDAS_FILE))
+        self.assertEqual([v['cliente']['cpf'] for v in vendas_b], ['11122233344'])
+        self.assertEqual(len(pl.load_json(os.path.join(b, pl.CLIENTES_FILE))), 1)
+        self.assertFalse(os.path.exists(os.path.join(b, pl.SYNC_CONFLITOS_FILE)))
+
+        # E a troca do cadastro na venda não faz a venda voltar para A
+        self.assertEqual(self.enviar(b, a, 'B', 'A')['vendas'], 0)
+
+    def test_venda_sem_id_e_exportada(self):
+        ana = cliente('Ana', '111')
+        sem_id = venda('x', ana, 50)
+        del sem_id['id']
+        a = self.loja('A', [ana], [venda('v1', ana, 100), sem_id])
+        b = self.loja('B', [], [])
+
+        self.enviar(a, b, 'A', 'B')
+        self.assertEqual(self.saldo(b, '111'), 150)
+        self.assertTrue(all(v.get('id') for v in pl.load_json(os.path.join(a, pl.VENDAS_FILE))))
+
+    def test_reimportar_pacote_nao_duplica(self):
+        ana = cliente('Ana', '111')
+        a = self.loja('A', [ana], [venda('v1', ana, 100)])
+        b = self.loja('B', [], [])
+
+        pacote = self.enviar(a, b, 'A', 'B')
+        pl.importar_alteracoes(pacote['arquivo'], b)
+
+        self.assertEqual(len(pl.load_json(os.path.join(b, pl.VENDAS_FILE))), 1)
+        self.assertEqual(self.saldo(b, '111'), 100)
+
+    def test_pacote_perdido_e_reenviado(self):
+        ana = cliente('Ana', '111')
+        a = self.loja('A', [ana], [venda('v1', ana, 100)])
+        b = self.loja('B', [], [])
+
+        pl.exportar_alteracoes('B', a, loja_id='A')  # nunca chega em B
+        pacote = pl.exportar_alteracoes('B', a)
+        self.assertEqual(pacote['vendas'], 1)
+        pl.importar_alteracoes(pacote['arquivo'], b, loja_id='B')
+        self.assertEqual(self.saldo(b, '111'), 100)
+
+    def test_tres_lojas_com_ids_repetidos(self):
+        joao = cliente('João', '111')
+        maria = cliente('Maria', '222')
+        a = self.loja('A', [joao], [venda('s1', joao, 80)])
+        b = self.loja('B', [maria], [venda('s1', maria, 50)])
+        c = self.loja('C', [], [])
+
+        self.enviar(a, b, 'A', 'B')
+        self.enviar(b, a, 'B', 'A')
+        self.enviar(a, c, 'A', 'C')
+        self.enviar(b, c, 'B', 'C')
+        self.enviar(c, a, 'C', 'A')
+        self.enviar(c, b, 'C', 'B')
+
+        for pasta in (a, b, c):
+            self.assertEqual(self.saldo(pasta, '111'), 80)
+            self.assertEqual(self.saldo(pasta, '222'), 50)
+            self.assertEqual(len(pl.load_json(os.path.join(pasta, pl.VENDAS_FILE))), 2)
+
+    def test_identidade_da_loja_e_destino(self):
+        a = self.loja('A', [], [])
+        b = self.loja('B', [], [])
+
+        with self.assertRaises(ValueError):
+            pl.exportar_alteracoes('B', a)
+        pacote = pl.exportar_alteracoes('C', a, loja_id='A')
+        with self.assertRaises(ValueError):
+            pl.exportar_alteracoes('C', a, loja_id='X')
+        with self.assertRaises(ValueError):
+            pl.importar_alteracoes(pacote['arquivo'], b, loja_id='B')
+
+
+if __name__ == '__main__':
+    unittest.main()